@@ -1,16 +1,21 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import plotly.graph_objects as go
 import streamlit.components.v1 as components
-from sr_core import analyze, SRConfig
+from sr_core import analyze, SRConfig, sr_levels_frame, fetch_ohlcv, fetch_ohlcv_batch, interval_to_seconds
 from streamlit_autorefresh import st_autorefresh
 import requests
+from requests.adapters import HTTPAdapter
 import yaml
 from yaml.loader import SafeLoader
 import firebase_admin
 from firebase_admin import credentials, db
 import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
 
 # --------- Firebase Connection ---------
 def get_firebase_cred():
@@ -26,50 +31,109 @@ def get_firebase_cred():
         return "firebase-key.json"
 
 FIREBASE_URL = st.secrets.firebase_key.firebase_url if "firebase_key" in st.secrets else "YOUR_FIREBASE_DB_URL_HERE"
-cred_path = get_firebase_cred()
-if not firebase_admin._apps:
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': FIREBASE_URL
-    })
+
+@st.cache_resource
+def init_firebase():
+    """Initialize the Firebase app once per server process"""
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(get_firebase_cred())
+        firebase_admin.initialize_app(cred, {
+            'databaseURL': FIREBASE_URL
+        })
+    return firebase_admin.get_app()
+
+@st.cache_resource
+def get_ref(path):
+    """Reuse database reference handles across reruns"""
+    init_firebase()
+    return db.reference(path)
+
+init_firebase()
+
+def save_user_bundle(username, user_data=None, watchlist=None, chat_id=None):
+    """Write any of user credentials, watchlist and Telegram chat_id in one multi-path update"""
+    updates = {}
+    if user_data is not None:
+        updates[f"credentials/usernames/{username}"] = user_data
+    if watchlist is not None:
+        updates[f"watchlists/{username}"] = watchlist
+    if chat_id is not None:
+        updates[f"user_settings/{username}/telegram_chat_id"] = chat_id
+    if not updates:
+        return
+    get_ref("/").update(updates)
+    if user_data is not None:
+        load_all_users.clear()
+    if watchlist is not None:
+        load_user_watchlist.clear()
+    if chat_id is not None:
+        load_user_telegram.clear()
 
 # Firebase functions for user credentials
+@st.cache_data(ttl=60, show_spinner=False)
 def load_all_users():
     """Load all users from Firebase"""
-    ref = db.reference("credentials/usernames")
+    ref = get_ref("credentials/usernames")
     data = ref.get()
     return data if data else {}
 
 def save_user_to_firebase(username, user_data):
     """Save a single user to Firebase"""
-    ref = db.reference(f"credentials/usernames/{username}")
-    ref.set(user_data)
+    save_user_bundle(username, user_data=user_data)
 
 # Firebase functions for watchlists
+@st.cache_data(ttl=60, show_spinner=False)
 def load_user_watchlist(username, default=None):
-    ref = db.reference(f"watchlists/{username}")
+    ref = get_ref(f"watchlists/{username}")
     data = ref.get()
     return data if isinstance(data, list) and data else (default or [])
 
 def save_user_watchlist(username, watchlist):
-    ref = db.reference(f"watchlists/{username}")
-    ref.set(watchlist)
+    save_user_bundle(username, watchlist=watchlist)
 
 # Firebase functions for user Telegram settings
+@st.cache_data(ttl=60, show_spinner=False)
 def load_user_telegram(username):
     """Load user's Telegram chat_id from Firebase"""
-    ref = db.reference(f"user_settings/{username}/telegram_chat_id")
+    ref = get_ref(f"user_settings/{username}/telegram_chat_id")
     return ref.get()
 
 def save_user_telegram(username, chat_id):
     """Save user's Telegram chat_id to Firebase"""
-    ref = db.reference(f"user_settings/{username}/telegram_chat_id")
-    ref.set(chat_id)
+    save_user_bundle(username, chat_id=chat_id)
+
+# --------- Telegram Connection ---------
+@st.cache_resource
+def telegram_sessions():
+    """Per-thread Telegram sessions; requests.Session is not safe to share between threads"""
+    return threading.local()
+
+def telegram_session(sessions):
+    """This thread's keep-alive session from `sessions`, created on first use"""
+    session = getattr(sessions, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        sessions.session = session
+    return session
+
+@st.cache_resource
+def alert_pool():
+    """Background workers so email/Telegram alerts never block page rendering"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="alerts")
 
 # --------- Load Config (Hybrid: YAML + Firebase) ---------
 CONFIG_PATH = 'credentials.yaml'
-with open(CONFIG_PATH) as file:
-    config = yaml.load(file, Loader=SafeLoader)
+# libyaml's C loader parses much faster when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', SafeLoader)
+
+@st.cache_data(show_spinner=False)
+def load_config(path):
+    """Parse the YAML config once; each rerun gets its own copy to mutate"""
+    with open(path) as file:
+        return yaml.load(file, Loader=YAML_LOADER)
+
+config = load_config(CONFIG_PATH)
 
 # Load users from Firebase (overrides YAML users for persistence)
 firebase_users = load_all_users()
@@ -105,6 +169,7 @@ if not st.session_state.get('authentication_status'):
             # Optionally save to local YAML for dev/backup
             with open(CONFIG_PATH, 'w') as file:
                 yaml.dump(config, file, default_flow_style=False, allow_unicode=True)
+            load_config.clear()
     except Exception as e:
         st.error(e)
 
@@ -130,6 +195,9 @@ if st.session_state.get('authentication_status'):
     ]
     if "watchlist" not in st.session_state:
         st.session_state.watchlist = load_user_watchlist(username, default=default_watchlist)
+    if "watchlist_set" not in st.session_state:
+        # Mirrors the ordered watchlist for O(1) membership checks
+        st.session_state.watchlist_set = set(st.session_state.watchlist)
 
     st.sidebar.subheader("Manage Watchlist")
     st.sidebar.write("Current Watchlist:")
@@ -141,17 +209,19 @@ if st.session_state.get('authentication_status'):
         new_symbol_clean = new_symbol.upper().strip()
         if new_symbol_clean == "":
             st.sidebar.error("Enter a symbol.")
-        elif new_symbol_clean in st.session_state.watchlist:
+        elif new_symbol_clean in st.session_state.watchlist_set:
             st.sidebar.warning("Symbol already added.")
         else:
             st.session_state.watchlist.append(new_symbol_clean)
+            st.session_state.watchlist_set.add(new_symbol_clean)
             save_user_watchlist(username, st.session_state.watchlist)
             st.success(f"Added {new_symbol_clean} to your watchlist!")
 
     remove_symbol = st.sidebar.selectbox("Remove Symbol", [""] + st.session_state.watchlist)
     if st.sidebar.button("Remove Symbol"):
-        if remove_symbol and remove_symbol in st.session_state.watchlist:
+        if remove_symbol and remove_symbol in st.session_state.watchlist_set:
             st.session_state.watchlist.remove(remove_symbol)
+            st.session_state.watchlist_set.discard(remove_symbol)
             save_user_watchlist(username, st.session_state.watchlist)
             st.warning(f"Removed {remove_symbol} from watchlist.")
 
@@ -200,7 +270,7 @@ if st.session_state.get('authentication_status'):
             try:
                 url = f"https://api.telegram.org/bot{telegram_token}/sendMessage"
                 payload = {"chat_id": current_chat_id, "text": "✅ Telegram alert test successful!"}
-                response = requests.post(url, data=payload)
+                response = telegram_session(telegram_sessions()).post(url, data=payload, timeout=5)
                 if response.status_code == 200:
                     st.sidebar.success("Test Telegram alert sent successfully!")
                 else:
@@ -258,33 +328,87 @@ if st.session_state.get('authentication_status'):
                 server.starttls()
                 server.login(from_email, password)
                 server.send_message(msg)
-                st.success(f"✅ Email sent to {to_email}")
         except Exception as e:
-            st.error(f"Email send failed: {e}")
+            # Runs on an alert_pool() worker, outside the script thread, so log instead of st.error
+            logger.error("Email send failed: %s", e)
 
-    def send_telegram_alert(message: str, token: str, chat_id: str) -> None:
+    def send_telegram_alert(message: str, token: str, chat_id: str, sessions) -> None:
+        # `sessions` is resolved on the script thread; st.cache_resource is not called from workers
         try:
             url = f"https://api.telegram.org/bot{token}/sendMessage"
             payload = {"chat_id": chat_id, "text": message}
-            requests.post(url, data=payload)
-            st.success("📲 Telegram alert sent!")
+            response = telegram_session(sessions).post(url, data=payload, timeout=5)
+            response.raise_for_status()
         except Exception as e:
-            st.error(f"Telegram send failed: {e}")
+            logger.error("Telegram send failed: %s", e)
+
+    @st.cache_data(show_spinner=False, max_entries=256)
+    def _fetch(symbol, period, interval, bucket):
+        # `bucket` changes once per bar interval, expiring the cached download
+        return fetch_ohlcv(symbol, period=period, interval=interval)
 
-    @st.cache_data(show_spinner=False)
-    def get_analysis(symbol, period, interval, _cfg, rsi_period, macd_fast, macd_slow, macd_signal, use_volume):
+    def fetch_prices(symbol, period, interval):
+        bucket = int(time.time() // interval_to_seconds(interval))
+        return _fetch(symbol, period, interval, bucket)
+
+    @st.cache_data(show_spinner=False, max_entries=32)
+    def _fetch_batch(symbols, period, interval, bucket):
+        return fetch_ohlcv_batch(list(symbols), period=period, interval=interval)
+
+    def fetch_watchlist_prices(symbols, period, interval):
+        bucket = int(time.time() // interval_to_seconds(interval))
+        return _fetch_batch(tuple(symbols), period, interval, bucket)
+
+    @st.cache_data(show_spinner=False, max_entries=64)
+    def get_analysis(df, distance, tolerance, rsi_period, macd_fast, macd_slow, macd_signal, use_volume):
+        cfg = SRConfig(distance=distance, tolerance=tolerance, min_touches=2)
         return analyze(
-            symbol=symbol, period=period, interval=interval, cfg=_cfg,
+            df=df, cfg=cfg,
             rsi_period=rsi_period, macd_fast=macd_fast, macd_slow=macd_slow,
             macd_signal=macd_signal, use_volume=use_volume
         )
 
-    def show_stock(symbol: str, hide_sr: bool = False):
+    def frame_fingerprint(frame):
+        # Cheap cache key for indicator frames: only a new or updated last bar changes it
+        return (len(frame), str(frame.index[-1]), tuple(frame.iloc[-1].tolist()))
+
+    def build_rsi_fig(df):
+        import plotly.graph_objects as go
+        fig_rsi = go.Figure()
+        fig_rsi.add_trace(go.Scatter(x=df.index, y=df["RSI"], mode="lines", name="RSI"))
+        fig_rsi.add_hline(y=70, line_dash="dot", line_color="red")
+        fig_rsi.add_hline(y=30, line_dash="dot", line_color="green")
+        return fig_rsi
+
+    def build_macd_fig(df):
+        import plotly.graph_objects as go
+        fig_macd = go.Figure()
+        fig_macd.add_trace(go.Scatter(x=df.index, y=df["MACD"], mode="lines", name="MACD"))
+        fig_macd.add_trace(go.Scatter(x=df.index, y=df["MACD_Signal"], mode="lines", name="Signal"))
+        return fig_macd
+
+    CHART_HEIGHT = 400
+
+    def figure_html(fig):
+        # Plotly.js comes from the CDN so each chart's HTML carries only its own data
+        return fig.to_html(include_plotlyjs='cdn', full_html=False, default_height=f"{CHART_HEIGHT - 20}px")
+
+    @st.cache_data(show_spinner=False, max_entries=64, hash_funcs={pd.DataFrame: frame_fingerprint})
+    def rsi_chart_html(df):
+        return figure_html(build_rsi_fig(df))
+
+    @st.cache_data(show_spinner=False, max_entries=64, hash_funcs={pd.DataFrame: frame_fingerprint})
+    def macd_chart_html(df):
+        return figure_html(build_macd_fig(df))
+
+    def show_stock(symbol: str, hide_sr: bool = False, prices: pd.DataFrame = None):
         st.subheader(f"🔹 {symbol}")
-        _cfg = SRConfig(distance=distance, tolerance=tolerance, min_touches=2)
         try:
+            if prices is None:
+                prices = fetch_prices(symbol, period, interval)
             sr, df, signals = get_analysis(
-                symbol, period, interval, _cfg,
+                prices,
+                distance, tolerance,
                 rsi_period, macd_fast, macd_slow, macd_signal,
                 enable_volume_filter
             )
@@ -296,11 +420,11 @@ if st.session_state.get('authentication_status'):
 
             if not hide_sr:
                 st.write("📊 Support & Resistance Levels")
-                st.dataframe(pd.DataFrame(sr))
+                st.dataframe(sr_levels_frame(sr))
 
             st.write("🚨 Live Alerts")
             for sig in signals:
-                alert_text = f"{sig['signal']} Signal! Price: {sig['price']}\nReason: {sig['reason']}"
+                alert_text = f"{sig['signal']} Signal! Price: {sig['price']:.2f}\nReason: {sig['reason']}"
                 if sig.get("Volume"):
                     alert_text += f"\nVolume: {sig['Volume']:.0f}"
 
@@ -319,19 +443,24 @@ if st.session_state.get('authentication_status'):
                             components.html("""<audio autoplay><source src="https://www.soundjay.com/buttons/sounds/beep-07.mp3" type="audio/mpeg"></audio>""", height=0)
 
                         if enable_email_alert and email_sender and email_password and email_receiver:
-                            send_email_alert(
+                            alert_pool().submit(
+                                send_email_alert,
                                 subject=f"{sig['signal']} Alert for {symbol}", body=alert_text,
                                 from_email=email_sender, password=email_password, to_email=email_receiver
                             )
+                            st.info(f"📧 Email alert queued for {email_receiver}")
                         
                         # Send to user's personal Telegram
                         current_user_chat_id = load_user_telegram(username)
                         if telegram_token and current_user_chat_id:
-                            send_telegram_alert(
+                            alert_pool().submit(
+                                send_telegram_alert,
                                 f"📊 v1.1 🚨 {sig['signal']} Alert for {symbol}\n⏳ Period: {period}, Interval: {interval}\n{alert_text}",
                                 telegram_token,
-                                current_user_chat_id
+                                current_user_chat_id,
+                                telegram_sessions()
                             )
+                            st.info("📲 Telegram alert queued")
                     st.session_state.last_alert[symbol] = sig['signal']
                 else:
                     st.markdown(
@@ -342,18 +471,11 @@ if st.session_state.get('authentication_status'):
             if not hide_sr:
                 if show_rsi:
                     st.subheader("📊 RSI Indicator")
-                    fig_rsi = go.Figure()
-                    fig_rsi.add_trace(go.Scatter(x=df.index, y=df["RSI"], mode="lines", name="RSI"))
-                    fig_rsi.add_hline(y=70, line_dash="dot", line_color="red")
-                    fig_rsi.add_hline(y=30, line_dash="dot", line_color="green")
-                    st.plotly_chart(fig_rsi, use_container_width=True)
+                    components.html(rsi_chart_html(df[["RSI"]]), height=CHART_HEIGHT)
 
                 if show_macd:
                     st.subheader("📊 MACD Indicator")
-                    fig_macd = go.Figure()
-                    fig_macd.add_trace(go.Scatter(x=df.index, y=df["MACD"], mode="lines", name="MACD"))
-                    fig_macd.add_trace(go.Scatter(x=df.index, y=df["MACD_Signal"], mode="lines", name="Signal"))
-                    st.plotly_chart(fig_macd, use_container_width=True)
+                    components.html(macd_chart_html(df[["MACD", "MACD_Signal"]]), height=CHART_HEIGHT)
 
         except Exception as e:
             st.error(f"Error fetching {symbol}: {e}")
@@ -364,8 +486,20 @@ if st.session_state.get('authentication_status'):
             show_stock(selected_stock, hide_sr=False)
     else:
         st.subheader("📢 Watchlist Live Alerts Only")
+        try:
+            watchlist_prices = fetch_watchlist_prices(st.session_state.watchlist, period, interval)
+        except Exception as e:
+            st.warning(f"Batch download failed, fetching symbols individually: {e}")
+            watchlist_prices = None
         for sym in st.session_state.watchlist:
-            show_stock(sym, hide_sr=True)
+            if watchlist_prices is None:
+                show_stock(sym, hide_sr=True)
+            elif sym in watchlist_prices:
+                show_stock(sym, hide_sr=True, prices=watchlist_prices[sym])
+            else:
+                # The batch already asked for this symbol; don't fetch it again
+                st.subheader(f"🔹 {sym}")
+                st.error(f"Error fetching {sym}: no data returned. Check symbol or internet.")
 
 elif st.session_state.get('authentication_status') == False:
     st.error('Username/password is incorrect')
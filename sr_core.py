@@ -1,9 +1,21 @@
+import re
 import pandas as pd
 import numpy as np
-from scipy.signal import find_peaks
-import yfinance as yf
 from typing import List, Tuple, Optional, Any, Dict
 
+# Indicator kernels are JIT-compiled with numba when available and run as plain Python otherwise.
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+_INTERVAL_SECONDS = {"m": 60, "h": 3600, "d": 86400, "wk": 7 * 86400, "mo": 30 * 86400}
+_OHLCV_CANON = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+_OHLCV_PATTERN = re.compile(r"(open|high|low|close|volume)", re.IGNORECASE)
+
 class SRConfig:
     """
     Configuration for Support/Resistance detection.
@@ -13,110 +25,307 @@ class SRConfig:
         self.tolerance = tolerance
         self.min_touches = min_touches
 
+def interval_to_seconds(interval: str) -> int:
+    """
+    Convert a yfinance bar interval (e.g. '5m', '1h', '1d') to seconds.
+    """
+    match = re.fullmatch(r"(\d+)(m|h|d|wk|mo)", interval.strip())
+    if match is None:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return int(match.group(1)) * _INTERVAL_SECONDS[match.group(2)]
+
+def _yfinance_cache():
+    """
+    Return the yfinance_cache module, or None when it is not installed.
+    """
+    # Market-data libraries are imported on first fetch to keep module import light
+    try:
+        import yfinance_cache as yfc
+    except ImportError:
+        return None
+    return yfc
+
+def fetch_ohlcv(symbol: str, period: Optional[str] = None, interval: Optional[str] = None) -> pd.DataFrame:
+    """
+    Fetch OHLCV bars for a symbol, reusing locally cached bars where possible.
+    """
+    period = period or "6mo"
+    interval = interval or "1d"
+    yfc = _yfinance_cache()
+    if yfc is not None:
+        # yfinance-cache only requests bars newer than the last cached one
+        data = yfc.Ticker(symbol).history(period=period, interval=interval)
+    else:
+        import yfinance as yf
+        data = yf.download(symbol, period=period, interval=interval, auto_adjust=True)
+    if data is None or data.empty:
+        raise ValueError("No data fetched from yfinance. Check symbol or internet.")
+    return data
+
+def fetch_ohlcv_batch(symbols: List[str], period: Optional[str] = None, interval: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch OHLCV bars for several symbols in one batched download; symbols with no data are omitted.
+
+    Uses the same source as fetch_ohlcv so prices are adjusted identically: yfinance-cache's
+    multi-ticker download when installed, otherwise yf.download.
+    """
+    period = period or "6mo"
+    interval = interval or "1d"
+    if not symbols:
+        return {}
+    yfc = _yfinance_cache()
+    if yfc is not None:
+        panel = yfc.download(
+            list(symbols), period=period, interval=interval,
+            group_by="ticker", threads=True, progress=False
+        )
+        if panel is not None and not isinstance(panel.columns, pd.MultiIndex):
+            # yfinance-cache returns a plain frame when only one ticker is requested
+            panel = pd.concat({symbols[0].upper(): panel}, axis=1)
+    else:
+        import yfinance as yf
+        panel = yf.download(
+            tickers=" ".join(symbols), period=period, interval=interval,
+            group_by="ticker", threads=True, auto_adjust=True
+        )
+    frames = {}
+    if panel is None or panel.empty or not isinstance(panel.columns, pd.MultiIndex):
+        return frames
+    available = set(panel.columns.get_level_values(0))
+    for symbol in symbols:
+        # yfinance-cache upper-cases ticker keys
+        key = symbol if symbol in available else symbol.upper()
+        if key in available:
+            # Tickers on different exchanges leave each other's sessions as all-NaN rows
+            frame = panel[key].dropna(how="all")
+            if not frame.empty:
+                frames[symbol] = frame
+    return frames
+
+@njit(cache=True)
+def _find_peaks(x, distance):
+    """
+    Indices of local maxima at least `distance` samples apart, keeping the higher peak.
+    Flat tops are reported once, at their middle sample. When two peaks within `distance`
+    have equal height the later one is kept; scipy's find_peaks breaks such ties arbitrarily,
+    so results only match it exactly when no equal-height peaks compete.
+    """
+    n = x.size
+    peaks = np.empty(n, dtype=np.int64)
+    count = 0
+    i = 1
+    while i < n - 1:
+        if x[i] > x[i - 1]:
+            j = i
+            while j + 1 < n and x[j + 1] == x[i]:
+                j += 1
+            if j + 1 < n and x[j + 1] < x[i]:
+                peaks[count] = (i + j) // 2
+                count += 1
+            i = j + 1
+        else:
+            i += 1
+    peaks = peaks[:count]
+    if distance <= 1 or count < 2:
+        return peaks
+    # Visit peaks from highest to lowest, suppressing lower neighbours closer than `distance`;
+    # the stable sort puts the later of two equal peaks last, so it is visited (and kept) first
+    order = np.argsort(x[peaks], kind="mergesort")
+    keep = np.ones(count, dtype=np.bool_)
+    for i in range(count - 1, -1, -1):
+        j = order[i]
+        if not keep[j]:
+            continue
+        k = j - 1
+        while k >= 0 and peaks[j] - peaks[k] < distance:
+            keep[k] = False
+            k -= 1
+        k = j + 1
+        while k < count and peaks[k] - peaks[j] < distance:
+            keep[k] = False
+            k += 1
+    return peaks[keep]
+
 def find_swings(df: pd.DataFrame, cfg: SRConfig) -> Tuple[np.ndarray, np.ndarray]:
     """
     Detect peaks (resistance) and troughs (support) in provided dataframe.
     """
     highs = pd.to_numeric(df['High'], errors='coerce').dropna().values
     lows = pd.to_numeric(df['Low'], errors='coerce').dropna().values
-    peak_idx, _ = find_peaks(highs, distance=cfg.distance)
-    trough_idx, _ = find_peaks(-lows, distance=cfg.distance)
+    peak_idx = _find_peaks(highs, cfg.distance)
+    trough_idx = _find_peaks(-lows, cfg.distance)
     return peak_idx, trough_idx
 
-def compute_sr_levels(df: pd.DataFrame, cfg: SRConfig) -> List[Dict[str, Any]]:
+def compute_sr_levels(df: pd.DataFrame, cfg: SRConfig) -> Dict[str, np.ndarray]:
     """
     Compute support/resistance levels based on detected swings.
+
+    Levels are returned as parallel arrays sorted by date:
+    "price" (float), "is_support" (bool) and "date" (datetime64, tz-naive in the index's local time).
     """
     peak_idx, trough_idx = find_swings(df, cfg)
-    sr_levels = []
-    for idx in peak_idx:
-        sr_levels.append({"type": "resistance", "price": df['High'].iloc[idx], "date": df.index[idx]})
-    for idx in trough_idx:
-        sr_levels.append({"type": "support", "price": df['Low'].iloc[idx], "date": df.index[idx]})
-    sr_levels.sort(key=lambda x: x['date'])
-    return sr_levels
+    highs = df['High'].to_numpy()
+    lows = df['Low'].to_numpy()
+    index = df.index
+    if getattr(index, "tz", None) is not None:
+        # tz-aware indexes convert to object arrays; keep exchange-local wall time as datetime64
+        index = index.tz_localize(None)
+    idx_arr = index.to_numpy()
+    prices = np.concatenate([highs[peak_idx], lows[trough_idx]])
+    dates = np.concatenate([idx_arr[peak_idx], idx_arr[trough_idx]])
+    is_support = np.concatenate([np.zeros(len(peak_idx), dtype=bool), np.ones(len(trough_idx), dtype=bool)])
+    # Stable sort keeps resistance ahead of support when both fall on the same bar
+    order = np.argsort(dates, kind="stable")
+    return {"price": prices[order], "is_support": is_support[order], "date": dates[order]}
+
+def sr_levels_frame(sr_levels: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Tabulate support/resistance levels for display.
+    """
+    return pd.DataFrame({
+        "type": np.where(sr_levels["is_support"], "support", "resistance"),
+        "price": sr_levels["price"],
+        "date": sr_levels["date"],
+    })
+
+@njit(cache=True, fastmath=True)
+def _rsi_kernel(close, period):
+    """
+    Single-pass RSI with Wilder's smoothing, seeded by a running mean over the first `period` bars.
+    """
+    n = close.size
+    out = np.empty_like(close)
+    if n == 0:
+        return out
+    out[0] = np.nan
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        if i <= period:
+            avg_gain += (gain - avg_gain) / i
+            avg_loss += (loss - avg_loss) / i
+        else:
+            avg_gain = (avg_gain * (period - 1) + gain) / period
+            avg_loss = (avg_loss * (period - 1) + loss) / period
+        rs = avg_gain / (avg_loss + 1e-6)
+        out[i] = 100 - (100 / (1 + rs))
+    return out
 
 def compute_rsi(series: pd.Series, period: int = 14) -> pd.Series:
     """
     Compute RSI indicator.
     """
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period, min_periods=1).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period, min_periods=1).mean()
-    rs = gain / (loss + 1e-6)
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    values = series.to_numpy(dtype=np.result_type(series.dtype, np.float32))
+    return pd.Series(_rsi_kernel(values, period), index=series.index, name=series.name)
+
+@njit(cache=True)
+def _ewm_step(value, weight, x, alpha):
+    """
+    One EMA update with pandas' ewm(adjust=False) semantics: NaN samples carry the value forward and decay its weight.
+    """
+    if np.isnan(value):
+        if np.isnan(x):
+            return value, weight
+        return x, 1.0
+    weight *= 1.0 - alpha
+    if np.isnan(x):
+        return value, weight
+    return (weight * value + alpha * x) / (weight + alpha), 1.0
+
+@njit(cache=True)
+def _macd_kernel(x, alpha_fast, alpha_slow, alpha_signal):
+    """
+    Single-pass MACD: fast, slow and signal EMAs (adjust=False) updated together per sample.
+    """
+    n = x.size
+    macd = np.empty_like(x)
+    sig = np.empty_like(x)
+    ema_fast = np.nan
+    ema_slow = np.nan
+    ema_sig = np.nan
+    wt_fast = 1.0
+    wt_slow = 1.0
+    wt_sig = 1.0
+    for i in range(n):
+        ema_fast, wt_fast = _ewm_step(ema_fast, wt_fast, x[i], alpha_fast)
+        ema_slow, wt_slow = _ewm_step(ema_slow, wt_slow, x[i], alpha_slow)
+        m = ema_fast - ema_slow
+        ema_sig, wt_sig = _ewm_step(ema_sig, wt_sig, m, alpha_signal)
+        macd[i] = m
+        sig[i] = ema_sig
+    return macd, sig
 
 def compute_macd(series: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[pd.Series, pd.Series]:
     """
     Compute MACD and Signal line.
     """
-    ema_fast = series.ewm(span=fast, adjust=False).mean()
-    ema_slow = series.ewm(span=slow, adjust=False).mean()
-    macd = ema_fast - ema_slow
-    signal_line = macd.ewm(span=signal, adjust=False).mean()
-    return macd, signal_line
+    values = series.to_numpy(dtype=np.result_type(series.dtype, np.float32))
+    macd, signal_line = _macd_kernel(values, 2.0 / (fast + 1), 2.0 / (slow + 1), 2.0 / (signal + 1))
+    return (
+        pd.Series(macd, index=series.index, name="MACD"),
+        pd.Series(signal_line, index=series.index, name="MACD_Signal"),
+    )
+
+def last_bar_snapshot(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Plain-float values of the last bar used for signal generation; missing indicators are None.
+    """
+    # One gather of the needed columns over the 20-bar tail instead of per-field pandas lookups
+    fields = [col for col in ("Close", "RSI", "MACD", "MACD_Signal", "Volume") if col in df.columns]
+    values = df[fields].iloc[-20:].to_numpy()
+    last = dict(zip(fields, values[-1].tolist()))
+    return {
+        "close": last["Close"],
+        "rsi": last.get("RSI"),
+        "macd": last.get("MACD"),
+        "macd_signal": last.get("MACD_Signal"),
+        "volume": last.get("Volume"),
+        # Like rolling(20).mean(), the average needs a full 20 bars; shorter frames never confirm volume
+        "avg_vol": float(values[:, fields.index("Volume")].mean()) if "Volume" in last and len(values) == 20 else None,
+        "time": df.index[-1],
+    }
 
 def generate_signals(
     df: pd.DataFrame, 
-    sr_levels: List[Dict[str, Any]], 
-    use_volume: bool = False
+    sr_levels: Dict[str, np.ndarray], 
+    use_volume: bool = False,
+    last: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate trading signals based on S/R, RSI, MACD, optional volume.
+    `last` is a last_bar_snapshot(df) the caller already holds; it is derived from df otherwise.
     """
+    if last is None:
+        last = last_bar_snapshot(df)
+    close_price = last["close"]
+    rsi = last["rsi"]
+    macd = last["macd"]
+    macd_signal = last["macd_signal"]
+    current_volume = last["volume"]
+    avg_volume = last["avg_vol"]
+
+    template = {"price": close_price, "time": last["time"], "RSI": rsi, "MACD": macd, "Volume": current_volume}
+    hold = {"signal": "HOLD", "reason": "No strong signal", **template}
+    if rsi is None or macd is None or macd_signal is None:
+        return [hold]
+
+    volume_ok = not use_volume or bool(current_volume and avg_volume and current_volume > avg_volume)
+    volume_reason = " + Volume confirmation" if use_volume else ""
+    prices = sr_levels["price"][-5:]
+    is_support = sr_levels["is_support"][-5:]
+
     signals = []
-    last_row = df.iloc[-1]
-    rsi = last_row.get("RSI", None)
-    macd = last_row.get("MACD", None)
-    macd_signal = last_row.get("MACD_Signal", None)
-    close_price = last_row["Close"]
-    current_volume = last_row.get("Volume", None)
-    avg_volume = df['Volume'].rolling(20).mean().iloc[-1] if 'Volume' in df.columns else None
-    signal_generated = False
-
-    for lvl in sr_levels[-5:]:
-        # Support / BUY
-        if lvl["type"] == "support" and close_price <= lvl["price"] * 1.01:
-            if rsi is not None and macd is not None and macd_signal is not None:
-                if rsi < 30 and macd > macd_signal and (not use_volume or (current_volume and avg_volume and current_volume > avg_volume)):
-                    signals.append({
-                        "signal": "BUY",
-                        "reason": "RSI oversold + near support + MACD bullish" + (" + Volume confirmation" if use_volume else ""),
-                        "price": close_price,
-                        "time": last_row.name,
-                        "RSI": rsi,
-                        "MACD": macd,
-                        "Volume": current_volume
-                    })
-                    signal_generated = True
-        # Resistance / SELL
-        if lvl["type"] == "resistance" and close_price >= lvl["price"] * 0.99:
-            if rsi is not None and macd is not None and macd_signal is not None:
-                if rsi > 70 and macd < macd_signal and (not use_volume or (current_volume and avg_volume and current_volume > avg_volume)):
-                    signals.append({
-                        "signal": "SELL",
-                        "reason": "RSI overbought + near resistance + MACD bearish" + (" + Volume confirmation" if use_volume else ""),
-                        "price": close_price,
-                        "time": last_row.name,
-                        "RSI": rsi,
-                        "MACD": macd,
-                        "Volume": current_volume
-                    })
-                    signal_generated = True
-
-    if not signal_generated:
-        signals.append({
-            "signal": "HOLD",
-            "reason": "No strong signal",
-            "price": close_price,
-            "time": last_row.name,
-            "RSI": rsi,
-            "MACD": macd,
-            "Volume": current_volume
-        })
-
-    return signals
+    # Support / BUY
+    if rsi < 30 and macd > macd_signal and volume_ok and np.any(is_support & (close_price <= prices * 1.01)):
+        signals.append({"signal": "BUY", "reason": "RSI oversold + near support + MACD bullish" + volume_reason, **template})
+    # Resistance / SELL
+    if rsi > 70 and macd < macd_signal and volume_ok and np.any(~is_support & (close_price >= prices * 0.99)):
+        signals.append({"signal": "SELL", "reason": "RSI overbought + near resistance + MACD bearish" + volume_reason, **template})
+
+    return signals or [hold]
 
 def analyze(
     symbol: Optional[str] = None,
@@ -130,7 +339,7 @@ def analyze(
     macd_slow: int = 26,
     macd_signal: int = 9,
     use_volume: bool = False
-) -> Tuple[List[Dict[str, Any]], pd.DataFrame, List[Dict[str, Any]]]:
+) -> Tuple[Dict[str, np.ndarray], pd.DataFrame, List[Dict[str, Any]]]:
     """
     Complete analysis, fetching data if needed, calculating indicators and signals.
     """
@@ -142,9 +351,7 @@ def analyze(
     elif csv_path:
         data = pd.read_csv(csv_path)
     elif symbol is not None:
-        data = yf.download(symbol, period=period or "6mo", interval=interval or "1d", auto_adjust=True)
-        if data.empty:
-            raise ValueError("No data fetched from yfinance. Check symbol or internet.")
+        data = fetch_ohlcv(symbol, period=period, interval=interval)
     else:
         raise ValueError("Must provide df, csv_path, or symbol to analyze.")
 
@@ -154,21 +361,25 @@ def analyze(
     # Standardize column names
     col_map = {}
     for col in data.columns:
-        col_lower = col.lower()
-        if 'open' in col_lower: col_map[col] = 'Open'
-        elif 'high' in col_lower: col_map[col] = 'High'
-        elif 'low' in col_lower: col_map[col] = 'Low'
-        elif 'close' in col_lower: col_map[col] = 'Close'
-        elif 'volume' in col_lower: col_map[col] = 'Volume'
+        match = _OHLCV_PATTERN.search(col)
+        if match:
+            col_map[col] = _OHLCV_CANON[match.group(1).lower()]
     data = data.rename(columns=col_map)
     # Ensure required columns exist
     required_cols = {'High', 'Low', 'Open', 'Close', 'Volume'}
     if not required_cols.issubset(data.columns):
         raise ValueError(f"Data must contain columns: {required_cols}")
-    # Convert columns to numeric
-    for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-        data[col] = pd.to_numeric(data[col], errors='coerce')
-    data.dropna(subset=['Open', 'High', 'Low', 'Close', 'Volume'], inplace=True)
+    # Convert columns to numeric; downloaded frames are already numeric and skip the coercion pass
+    ohlcv = ['Open', 'High', 'Low', 'Close', 'Volume']
+    block = data[ohlcv]
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in block.dtypes):
+        block = block.apply(pd.to_numeric, errors='coerce')
+    # float32 halves memory traffic through the indicator kernels; precision is ample for prices.
+    # Volume stays float64: it feeds no kernel and share counts above 2**24 would lose precision.
+    price_cols = ['Open', 'High', 'Low', 'Close']
+    data[price_cols] = block[price_cols].astype(np.float32)
+    data['Volume'] = block['Volume'].astype(np.float64)
+    data.dropna(subset=ohlcv, inplace=True)
     # Ensure datetime index
     if not isinstance(data.index, pd.DatetimeIndex):
         if 'Date' in data.columns:
@@ -180,5 +391,5 @@ def analyze(
     sr = compute_sr_levels(data, cfg)
     data["RSI"] = compute_rsi(data["Close"], period=rsi_period)
     data["MACD"], data["MACD_Signal"] = compute_macd(data["Close"], fast=macd_fast, slow=macd_slow, signal=macd_signal)
-    signals = generate_signals(data, sr, use_volume=use_volume)
+    signals = generate_signals(data, sr, use_volume=use_volume, last=last_bar_snapshot(data))
     return sr, data, signals